@@ -2,10 +2,12 @@
 """
 Backpack Grid Bot (AMM-style both sides) – Defi Grid
 
-Default: PAPER mode (no live orders). Set LIVE=true in .env to enable live path
-and implement the Ed25519 signing in BackpackClient.sign_request().
+Default: PAPER mode (no live orders). Set LIVE=true in .env to enable the live
+path; Ed25519 signing needs pynacl and a base64-encoded key seed in API_SECRET.
 """
 import asyncio
+import base64
+import json
 import math
 import os
 import time
@@ -13,9 +15,12 @@ from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
 import httpx
+import numba
+import numpy as np
+import orjson
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 
 load_dotenv()
@@ -46,6 +51,7 @@ WINDOW_MS = INT("WINDOW_MS", 1200)
 ORDER_TTL_SEC = INT("ORDER_TTL_SEC", 10)
 ORDER_TOPCHASE_TICKS = INT("ORDER_TOPCHASE_TICKS", 1)
 MAX_DEV_BPS = FLOAT("MAX_DEV_BPS", 25)
+TICK = FLOAT("TICK", 1e-6)  # price tick; internally prices are int64 tick counts
 
 # Risk / exit
 TAKE_PROFIT_PCT = FLOAT("TAKE_PROFIT_PCT", 1.0)
@@ -61,6 +67,13 @@ ALO_JOIN_BEST = BOOL("ALO_JOIN_BEST", True)
 STRICT_MAKER_NEAR_TOP = BOOL("STRICT_MAKER_NEAR_TOP", True)
 
 LOG_LEVEL = STR("LOG_LEVEL", "INFO").upper()
+RENDER_MIN_SEC = FLOAT("RENDER_MIN_SEC", 0.5)
+
+# Derived constants (fixed once env is loaded; avoids per-tick re-division)
+_STEP_FRAC = GRID_STEP_BPS / 10000
+_MAX_DEV_FRAC = MAX_DEV_BPS / 10000
+_TP_MULT = (1 + TAKE_PROFIT_PCT / 100) * (1 + TP_OFFSET_BPS / 10000)
+_INV_TICK = 1.0 / TICK
 
 # === Simple market snapshot (paper) ===
 @dataclass
@@ -70,14 +83,23 @@ class MarketSnapshot:
     ts: float
 
 class PaperBook:
+    DRIFT_BUF_SIZE = 4096
+
     def __init__(self, mid: float=150.0, spread_bps: float=2.0):
         self.mid = mid
         self.spread_bps = spread_bps
+        self._rng = np.random.default_rng()
+        self._drift_buf = self._rng.uniform(-0.05, 0.05, size=self.DRIFT_BUF_SIZE)
+        self._drift_i = 0
 
     def midprice(self) -> float:
         # Simple random walk for demo; in real use, pull from exchange.
-        import random
-        drift = random.uniform(-0.05, 0.05)
+        # Drifts are drawn in batches so the hot path is one array read.
+        if self._drift_i >= self._drift_buf.size:
+            self._drift_buf = self._rng.uniform(-0.05, 0.05, size=self.DRIFT_BUF_SIZE)
+            self._drift_i = 0
+        drift = self._drift_buf[self._drift_i]
+        self._drift_i += 1
         self.mid = max(0.01, self.mid * (1 + drift/100))
         return self.mid
 
@@ -91,46 +113,76 @@ class BackpackClient:
     def __init__(self, api_base: str, key: str, secret: str):
         self.base = api_base.rstrip('/')
         self.key = key
-        self.secret = secret
-        self.http = httpx.AsyncClient(timeout=10)
+        from nacl.signing import SigningKey  # live-only dependency
+        self._signer = SigningKey(base64.b64decode(secret))
+        # Static header fields assembled once; sign_request fills a copy
+        self._header_tmpl = {"X-API-KEY": key, "Content-Type": "application/json"}
+        # HTTP/2 multiplexes concurrent requests over one TCP+TLS connection;
+        # the keep-alive pool amortizes handshakes across signed calls
+        self.http = httpx.AsyncClient(
+            timeout=10, http2=True,
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
 
     async def close(self):
         await self.http.aclose()
 
     def sign_request(self, method: str, path: str, body: str) -> Dict[str, str]:
-        """TODO: Implement real Ed25519 signing here per Backpack API docs.
-        Common pattern:
-          - ts = str(int(time.time() * 1000))
-          - msg = ts + method.upper() + path + body
-          - sig = ed25519_sign(secret, msg)
-          - return headers with X-API-KEY, X-API-SIGNATURE, X-API-TIMESTAMP
+        """Ed25519-sign (timestamp + method + path + body) per Backpack API docs.
+
+        The SigningKey is built once in __init__, so each call is one join,
+        one sign and one header-dict copy.
         """
-        raise NotImplementedError("Fill Ed25519 signing per Backpack API to trade live.")
+        ts = str(int(time.time() * 1000))
+        msg = "".join((ts, method.upper(), path, body)).encode()
+        sig = base64.b64encode(self._signer.sign(msg).signature).decode()
+        headers = dict(self._header_tmpl)
+        headers["X-API-TIMESTAMP"] = ts
+        headers["X-API-SIGNATURE"] = sig
+        return headers
 
     async def get_markets(self):
         url = f"{self.base}/api/v1/markets"
         r = await self.http.get(url)
         r.raise_for_status()
-        return r.json()
+        return orjson.loads(r.content)
+
+    async def get_many(self, paths: List[str]) -> List[dict]:
+        """Fan several GETs out concurrently (ticker + balance + open orders
+        per tick in live mode); total latency is max(RTT), not sum(RTT)."""
+        resps = await asyncio.gather(*(self.http.get(f"{self.base}{p}") for p in paths))
+        for r in resps:
+            r.raise_for_status()
+        return [orjson.loads(r.content) for r in resps]
+
+    async def stream_ticker(self, symbol: str):
+        """Yield MarketSnapshot from the public bookTicker WS stream.
+
+        Push-driven: ticks arrive as the book moves, with no per-tick REST
+        round-trip and no rate-limit budget spent on polling.
+        """
+        import websockets  # live-only dependency, imported once per stream
+
+        async with websockets.connect("wss://ws.backpack.exchange") as ws:
+            await ws.send(json.dumps({"method": "SUBSCRIBE", "params": [f"bookTicker.{symbol}"]}))
+            async for raw in ws:
+                data = json.loads(raw).get("data") or {}
+                if "b" in data and "a" in data:
+                    yield MarketSnapshot(bid=float(data["b"]), ask=float(data["a"]), ts=time.time())
 
     # add place_order/cancel endpoints after sign_request is implemented
 
 # === Strategy structures ===
-@dataclass
-class Order:
-    side: str  # 'buy' or 'sell'
-    price: float
-    size_usd: float
-    ts: float
-    reduce_only: bool=False
-
-class Position(BaseModel):
+# Plain slots dataclass: update_on_fill mutates fields on every fill, and
+# nothing untrusted flows in, so pydantic validation was pure overhead.
+@dataclass(slots=True)
+class Position:
     qty: float = 0.0
     avg_entry: float = 0.0
     last_fill_ts: float = 0.0
+    tp_target: float = 0.0  # avg_entry * _TP_MULT, refreshed on every fill
 
-    def update_on_fill(self, side: str, price: float, qty: float):
-        now = time.time()
+    def update_on_fill(self, side: str, price: float, qty: float, now: float):
         if side == 'buy':
             new_notional = self.qty * self.avg_entry + qty * price
             self.qty += qty
@@ -142,6 +194,49 @@ class Position(BaseModel):
                 self.qty = 0.0
                 self.avg_entry = 0.0
         self.last_fill_ts = now
+        # TP target only moves when avg_entry does, so price it here instead
+        # of re-multiplying every tick
+        self.tp_target = self.avg_entry * _TP_MULT if self.qty > 1e-12 else 0.0
+
+# === Hot kernels (nopython-compiled) ===
+@numba.njit('Tuple((int64[:], int8[:]))(float64, float64, int64, int64, float64, float64)',
+            cache=True, fastmath=True)
+def _build_ladder(mid, step, n_bids, n_asks, max_dev_frac, inv_tick):
+    """Both grid sides in one pass over one preallocated buffer: bids
+    (closest first) then asks, clipped to max_dev_frac and quantized to int64
+    tick counts (price / TICK). Side codes match the SoA book: 0=buy, 1=sell.
+
+    The explicit signature skips type inference on the first call;
+    cache=True persists the compiled code.
+    """
+    prices = np.empty(n_bids + n_asks, dtype=np.int64)
+    sides = np.empty(n_bids + n_asks, dtype=np.int8)
+    max_dev = max_dev_frac * mid
+    k = 0
+    for i in range(1, n_bids + 1):
+        price = mid - i * step
+        if abs(price - mid) > max_dev:
+            continue
+        prices[k] = int(round(price * inv_tick))
+        sides[k] = 0
+        k += 1
+    for i in range(1, n_asks + 1):
+        price = mid + i * step
+        if abs(price - mid) > max_dev:
+            continue
+        prices[k] = int(round(price * inv_tick))
+        sides[k] = 1
+        k += 1
+    return prices[:k], sides[:k]
+
+@numba.njit('boolean[:](int64[:], int8[:], int64, int64)', cache=True)
+def _scan_fills(prices, sides, bid, ask):
+    """Fill mask over the open-order columns: buys (side 0) fill at price >= ask,
+    sells (side 1) at price <= bid. Branchless so the loop vectorizes."""
+    fill = np.empty(prices.shape[0], dtype=np.bool_)
+    for i in range(prices.shape[0]):
+        fill[i] = ((sides[i] == 0) & (prices[i] >= ask)) | ((sides[i] == 1) & (prices[i] <= bid))
+    return fill
 
 # === Bot ===
 class GridBot:
@@ -156,115 +251,183 @@ class GridBot:
             self.live_client = BackpackClient(API_BASE, key, secret)
 
         self.pos = Position()
-        self.open_orders: List[Order] = []
+        # Open orders as Structure-of-Arrays: parallel columns, side 0=buy/1=sell;
+        # the price column holds int64 tick counts, not floats
+        self.order_price = np.empty(0, dtype=np.int64)
+        self.order_size = np.empty(0, dtype=np.float64)
+        self.order_ts = np.empty(0, dtype=np.float64)
+        self.order_side = np.empty(0, dtype=np.int8)
         self.last_reprice = 0.0
+        # Ladder memo: price arrays are pure in mid, so reuse them while mid
+        # stays within half a grid step of the last build.
+        self._ladder_mid = 0.0
+        self._ladder_prices: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._live: Optional[Live] = None
+        self._last_render = 0.0
+
+    def _keep_orders(self, keep: np.ndarray):
+        if keep.all():
+            return
+        self.order_price = self.order_price[keep]
+        self.order_size = self.order_size[keep]
+        self.order_ts = self.order_ts[keep]
+        self.order_side = self.order_side[keep]
 
-    def desired_ladders(self, snap: MarketSnapshot) -> Tuple[List[Order], List[Order]]:
+    def desired_ladders(self, snap: MarketSnapshot) -> Tuple[np.ndarray, np.ndarray]:
         mid = (snap.bid + snap.ask) / 2
-        step = GRID_STEP_BPS / 10000 * mid
-        bids, asks = [], []
+        step = _STEP_FRAC * mid
 
         # Ladder sizes per side
         n_bids = ROLLING_WINDOW_BIDS if ENABLE_AMM_BIDS else 0
         n_asks = ROLLING_WINDOW_ASKS if ENABLE_AMM_ASKS else 0
 
-        # Build around mid with arithmetic spacing
-        for i in range(1, n_bids + 1):
-            price = mid - i * step
-            if abs((price - mid) / mid) * 10000 > MAX_DEV_BPS:
-                continue
-            bids.append(Order('buy', round(price, 6), ORDER_USD, time.time()))
-        for i in range(1, n_asks + 1):
-            price = mid + i * step
-            if abs((price - mid) / mid) * 10000 > MAX_DEV_BPS:
-                continue
-            asks.append(Order('sell', round(price, 6), ORDER_USD, time.time()))
-
-        # Top-chase (join-best) – nudge nearest quotes toward current best
-        if ALO_JOIN_BEST and bids:
-            bids[0].price = min(bids[0].price + ORDER_TOPCHASE_TICKS * step * 0.25, snap.bid)
-        if ALO_JOIN_BEST and asks:
-            asks[0].price = max(asks[0].price - ORDER_TOPCHASE_TICKS * step * 0.25, snap.ask)
-
-        return bids, asks
-
-    def enforce_ttls(self):
-        now = time.time()
-        before = len(self.open_orders)
-        self.open_orders = [o for o in self.open_orders if now - o.ts < ORDER_TTL_SEC]
-        after = len(self.open_orders)
-        if before != after and LOG_LEVEL == 'DEBUG':
-            console.log(f"Repriced/canceled {before - after} stale orders")
-
-    def simulate_fills(self, snap: MarketSnapshot):
+        # Build both sides in one fused kernel pass (memoized); ts/size are
+        # attached when the orders land in the book
+        if self._ladder_prices is not None and abs(mid - self._ladder_mid) < 0.5 * step:
+            prices, sides = self._ladder_prices
+        else:
+            prices, sides = _build_ladder(mid, step, n_bids, n_asks, _MAX_DEV_FRAC, _INV_TICK)
+            self._ladder_mid = mid
+            self._ladder_prices = (prices, sides)
+
+        # Top-chase (join-best) – nudge nearest quotes toward current best.
+        # Copy first so the memoized array stays pristine.
+        if ALO_JOIN_BEST and prices.size:
+            prices = prices.copy()
+            chase = int(round(ORDER_TOPCHASE_TICKS * step * 0.25 * _INV_TICK))
+            nb = int(np.searchsorted(sides, 1))  # bids precede asks
+            if nb:
+                prices[0] = min(prices[0] + chase, int(round(snap.bid * _INV_TICK)))
+            if nb < prices.size:
+                prices[nb] = max(prices[nb] - chase, int(round(snap.ask * _INV_TICK)))
+
+        return prices, sides
+
+    def enforce_ttls(self, now: float):
+        # order_ts is append-ordered and therefore sorted, so expired orders
+        # form a prefix: binary-search the cutoff instead of scanning the book
+        cut = int(np.searchsorted(self.order_ts, now - ORDER_TTL_SEC, side='right'))
+        if cut == 0:
+            return
+        self.order_price = self.order_price[cut:]
+        self.order_size = self.order_size[cut:]
+        self.order_ts = self.order_ts[cut:]
+        self.order_side = self.order_side[cut:]
+        if LOG_LEVEL == 'DEBUG':
+            console.log(f"Repriced/canceled {cut} stale orders")
+
+    def _apply_fills(self, prices: np.ndarray, sides: np.ndarray, sizes: np.ndarray,
+                     snap: MarketSnapshot, now: float) -> Optional[np.ndarray]:
+        """Scan price/side columns against the snapshot, book filled orders into
+        the position, and return the keep-mask (None when nothing filled)."""
+        bid_t = int(round(snap.bid * _INV_TICK))
+        ask_t = int(round(snap.ask * _INV_TICK))
+        fill = _scan_fills(prices, sides, bid_t, ask_t)
+        if not fill.any():
+            return None
+        mid = (snap.ask + snap.bid) / 2
+        for i in np.nonzero(fill)[0]:
+            side = 'buy' if sides[i] == 0 else 'sell'
+            self.pos.update_on_fill(side, prices[i] * TICK, float(sizes[i]) / mid, now)
+        return ~fill
+
+    def simulate_fills(self, snap: MarketSnapshot, now: float):
         # Simple fill model: if a buy price >= ask or sell price <= bid, fill
-        filled: List[Order] = []
-        for o in self.open_orders:
-            if o.side == 'buy' and o.price >= snap.ask:
-                filled.append(o)
-            elif o.side == 'sell' and o.price <= snap.bid:
-                filled.append(o)
-        for o in filled:
-            qty = o.size_usd / ((snap.ask + snap.bid)/2)
-            self.pos.update_on_fill(o.side, o.price, qty)
-            self.open_orders.remove(o)
-
-    def place_ladders(self, bids: List[Order], asks: List[Order]):
-        # Paper: just track them
-        self.open_orders.extend(bids + asks)
-
-    def maybe_take_profit(self, snap: MarketSnapshot):
+        if self.order_price.size == 0:
+            return
+        keep = self._apply_fills(self.order_price, self.order_side, self.order_size, snap, now)
+        if keep is not None:
+            self._keep_orders(keep)
+
+    def place_ladders(self, prices: np.ndarray, sides: np.ndarray,
+                      snap: MarketSnapshot, now: float):
+        # Paper: track them on the SoA columns — fused with the fill scan, so
+        # quotes that would fill against this snapshot go straight to the
+        # position and are never appended and re-scanned
+        if prices.size == 0:
+            return
+        sizes = np.full(prices.size, ORDER_USD)
+        keep = self._apply_fills(prices, sides, sizes, snap, now)
+        if keep is not None:
+            prices, sides, sizes = prices[keep], sides[keep], sizes[keep]
+            if prices.size == 0:
+                return
+        self.order_price = np.concatenate([self.order_price, prices])
+        self.order_size = np.concatenate([self.order_size, sizes])
+        self.order_ts = np.concatenate([self.order_ts, np.full(prices.size, now)])
+        self.order_side = np.concatenate([self.order_side, sides])
+
+    def maybe_take_profit(self, snap: MarketSnapshot, now: float):
         if self.pos.qty <= 0:
             return
-        target = self.pos.avg_entry * (1 + TAKE_PROFIT_PCT/100)
-        target *= (1 + TP_OFFSET_BPS/10000)
+        target = self.pos.tp_target
         if snap.ask >= target:
             qty = self.pos.qty
-            self.pos.update_on_fill('sell', target, qty)
+            self.pos.update_on_fill('sell', target, qty, now)
             if LOG_LEVEL in ('INFO','DEBUG'):
                 console.log(f"[TP] Sold {qty:.4f} @ {target:.4f} (avg_entry={self.pos.avg_entry:.4f})")
 
-    def render_status(self, snap: MarketSnapshot):
-        table = Table(title=f"{SYMBOL} @ {time.strftime('%H:%M:%S')} (paper={not LIVE})")
+    def render_status(self, snap: MarketSnapshot, now: float):
+        if now - self._last_render < RENDER_MIN_SEC:
+            return
+        self._last_render = now
+        table = Table(title=f"{SYMBOL} @ {time.strftime('%H:%M:%S', time.localtime(now))} (paper={not LIVE})")
         table.add_column("Metric"); table.add_column("Value")
         mid = (snap.bid + snap.ask)/2
         table.add_row("Bid/Ask", f"{snap.bid:.4f} / {snap.ask:.4f}")
         table.add_row("Mid", f"{mid:.4f}")
-        table.add_row("Open Orders", str(len(self.open_orders)))
+        table.add_row("Open Orders", str(self.order_price.size))
         table.add_row("Pos Qty", f"{self.pos.qty:.4f}")
         table.add_row("Avg Entry", f"{self.pos.avg_entry:.4f}")
-        console.print(table)
+        if self._live is not None:
+            self._live.update(table)  # redraw in place instead of scrolling
+        else:
+            console.print(table)
 
-    async def loop(self):
-        try:
-            while True:
-                snap = self.paper.snapshot() if not LIVE else None  # replace with live ticker
-                if snap is None:
-                    # If implementing live, pull from REST or websocket here
-                    raise NotImplementedError("Live ticker not implemented in this skeleton")
+    def tick(self, snap: MarketSnapshot, now: float):
+        # Maintenance
+        self.enforce_ttls(now)
 
-                # Maintenance
-                self.enforce_ttls()
+        # Resting orders vs the fresh snapshot
+        self.simulate_fills(snap, now)
 
-                # Target ladders
-                bids, asks = self.desired_ladders(snap)
-                self.place_ladders(bids, asks)
+        # Target ladders; new quotes are scanned in-register inside
+        # place_ladders, so only the non-filling ones enter the book
+        prices, sides = self.desired_ladders(snap)
+        self.place_ladders(prices, sides, snap, now)
 
-                # Simulate fills and TP
-                self.simulate_fills(snap)
-                self.maybe_take_profit(snap)
+        self.maybe_take_profit(snap, now)
 
-                if LOG_LEVEL in ('INFO','DEBUG'):
-                    self.render_status(snap)
+        if LOG_LEVEL in ('INFO','DEBUG'):
+            self.render_status(snap, now)
 
-                await asyncio.sleep(WINDOW_MS/1000)
+    async def loop(self):
+        try:
+            self._live = Live(console=console, refresh_per_second=2)
+            self._live.start()
+            if LIVE:
+                # Tick-driven: quotes follow WS pushes instead of a sleep timer
+                async for snap in self.live_client.stream_ticker(SYMBOL):
+                    self.tick(snap, time.time())
+            else:
+                while True:
+                    snap = self.paper.snapshot()
+                    self.tick(snap, time.time())
+                    await asyncio.sleep(WINDOW_MS/1000)
         except KeyboardInterrupt:
             console.log("Shutting down…")
         finally:
+            if self._live is not None:
+                self._live.stop()
             if self.live_client:
                 await self.live_client.close()
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # stdlib loop works fine; uvloop is a Linux/macOS-only speedup
     bot = GridBot()
     asyncio.run(bot.loop())